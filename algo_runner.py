@@ -1,11 +1,16 @@
 import os
+import sys
+import signal
+import fcntl
+import selectors
 import subprocess
 import csv
 import shutil
 import concurrent.futures
 import threading
 import time
-import tempfile
+import random
+from collections import deque
 from functools import partial
 from typing import List, Dict, Callable, Optional
 import psutil
@@ -14,18 +19,365 @@ import utils as utils
 import config as cfg
 import convert_fbs_to_csv
 
-def get_runtime_and_memory_limit_prefix(max_cores):
-    limit_prefix = ""
-    if cfg.RUNTIME_LIMIT_ACTIVE:
-        limit_prefix += f"timeout --signal=TERM --kill-after=5s {cfg.RUNTIME_LIMIT_IN_HOURS}h "
+def get_memory_limit(max_cores) -> Optional[int]:
+    ''' Returns the address space limit in bytes for a single job, or None if deactivated. '''
     if cfg.MEMORY_LIMIT_ACTIVE:
-        limit_prefix += f'prlimit --as=$(({int(cfg.MEMORY_ON_MACHINE / max_cores)}*1024*1024*1024)) -- '
-    return limit_prefix
+        return int(cfg.MEMORY_ON_MACHINE / max_cores) * 1024 * 1024 * 1024
+    return None
+
+def get_runtime_limit() -> Optional[float]:
+    ''' Returns the runtime limit in seconds for a single job, or None if deactivated. '''
+    if cfg.RUNTIME_LIMIT_ACTIVE:
+        return cfg.RUNTIME_LIMIT_IN_HOURS * 3600
+    return None
+
+PIPE_BUFFER_SIZE = 1 << 20
+READ_CHUNK_SIZE = 64 * 1024
+
+def _grow_pipe(pipe):
+    ''' Enlarges the kernel buffer of a pipe so fast producers do not stall (Linux only). '''
+    if pipe is None or not sys.platform.startswith("linux"):
+        return
+    try:
+        fcntl.fcntl(pipe.fileno(), getattr(fcntl, "F_SETPIPE_SZ", 1031), PIPE_BUFFER_SIZE)
+    except OSError:
+        pass  # Exceeds /proc/sys/fs/pipe-max-size, keep the default size
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+# Serializes the output of concurrent jobs, so lines of different jobs never mix
+_OUTPUT_LOCK = threading.Lock()
+
+class _LineWriter:
+    """
+    Forwards the output of a job to fd in complete lines, each prefixed with the job's tag
+    (like parallel --line-buffer --tag). An incomplete line is kept until it is completed,
+    flush() is called or it grows beyond PIPE_BUFFER_SIZE.
+    """
+    def __init__(self, fd, tag):
+        self.fd = fd
+        self.prefix = f"{tag}\t".encode()
+        self.pending = b""
+
+    def write(self, data):
+        data = self.pending + data
+        end = data.rfind(b"\n") + 1
+        self.pending = data[end:]
+        if end:
+            self._emit(data[:end - 1])
+        if len(self.pending) >= PIPE_BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            pending, self.pending = self.pending, b""
+            self._emit(pending)
+
+    def _emit(self, text):
+        lines = b"".join(self.prefix + line + b"\n" for line in text.split(b"\n"))
+        with _OUTPUT_LOCK:
+            _write_all(self.fd, lines)
+
+def _open_pidfd(proc) -> Optional[int]:
+    ''' Returns a descriptor that becomes readable once proc exits, or None if unsupported (Linux >= 5.3 only). '''
+    if not hasattr(os, "pidfd_open"):
+        return None
+    try:
+        return os.pidfd_open(proc.pid)
+    except OSError:
+        return None
+
+def _drain(proc, out_writer, err_writer, timeout_s=None) -> bool:
+    """
+    Passes the job's stdout to out_writer and its stderr to err_writer whenever data is ready,
+    until both pipes reach EOF and the job has exited.
+
+    The exit is observed through a pidfd in the same selector, so waiting never polls.
+
+    Returns:
+        True if the job exited, False if timeout_s expired first
+    """
+    deadline = None if timeout_s is None else time.monotonic() + timeout_s
+    sel = selectors.DefaultSelector()
+    for pipe, writer in ((proc.stdout, out_writer), (proc.stderr, err_writer)):
+        if pipe is not None and not pipe.closed:
+            sel.register(pipe, selectors.EVENT_READ, writer)
+    pidfd = _open_pidfd(proc)
+    if pidfd is not None:
+        sel.register(pidfd, selectors.EVENT_READ, None)
+    try:
+        while sel.get_map():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            for key, _ in sel.select(remaining):
+                if key.fd == pidfd:
+                    sel.unregister(pidfd)  # The job exited
+                    continue
+                data = os.read(key.fd, READ_CHUNK_SIZE)
+                if data:
+                    key.data.write(data)
+                else:
+                    key.data.flush()
+                    sel.unregister(key.fileobj)
+                    key.fileobj.close()
+    finally:
+        sel.close()
+        if pidfd is not None:
+            os.close(pidfd)
+
+    # Popen.poll() (e.g. in terminate()) may already have reaped the job
+    if pidfd is None and proc.returncode is None:
+        if deadline is not None:
+            # Without a pidfd there is no way to block on the exit with a timeout
+            try:
+                proc.wait(max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                return False
+        else:
+            # Block until the job exits but leave reaping it to proc.wait()
+            os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+    proc.wait()
+    return True
+
+def _signal_group(proc, sig):
+    ''' Sends sig to the job's process group, so child processes of the job get it as well. '''
+    try:
+        os.killpg(proc.pid, sig)
+    except ProcessLookupError:
+        pass  # The whole group has exited already
+
+# Jobs that are running right now. They live in their own sessions and would not get our
+# SIGINT, so _kill_live_jobs() takes them down when the runner is interrupted or crashes.
+_live_jobs = set()
+_live_jobs_lock = threading.Lock()
+
+def _kill_live_jobs():
+    ''' Kills the process groups of all running jobs. '''
+    with _live_jobs_lock:
+        procs = list(_live_jobs)
+    for proc in procs:
+        _signal_group(proc, signal.SIGKILL)
+
+def _spawn(argv, mem_bytes, timeout_s, stdout=subprocess.PIPE, cwd=None, tag=None) -> int:
+    """
+    Runs argv without a shell in the directory cwd and returns its return code.
+
+    The memory limit is set by prlimit, which execs argv afterwards (a preexec_fn is not
+    safe here, the jobs are started from the pool's worker threads). On timeout the job gets SIGTERM
+    and, if it is still alive after 5 seconds, SIGKILL (like timeout --kill-after=5s). Every job
+    runs in its own session and the signals go to the whole process group, as with timeout.
+    A piped stdout is forwarded to our stdout, alternatively stdout can be a file descriptor.
+    Forwarded lines are prefixed with tag (defaults to the command line).
+    """
+    limits = [] if mem_bytes is None else ["prlimit", f"--as={mem_bytes}", "--"]
+    proc = subprocess.Popen(
+        limits + argv,
+        stdout=stdout,
+        cwd=cwd,
+        stderr=subprocess.PIPE,
+        bufsize=PIPE_BUFFER_SIZE,
+        start_new_session=True,
+    )
+    with _live_jobs_lock:
+        _live_jobs.add(proc)
+    _grow_pipe(proc.stdout)
+    _grow_pipe(proc.stderr)
+    if tag is None:
+        tag = ' '.join(argv)
+    writers = (_LineWriter(sys.stdout.fileno(), tag), _LineWriter(sys.stderr.fileno(), tag))
+    try:
+        with proc:
+            if not _drain(proc, *writers, timeout_s):
+                utils.fprint(f"Runtime limit exceeded, terminating: {' '.join(argv)}")
+                _signal_group(proc, signal.SIGTERM)
+                if not _drain(proc, *writers, 5):
+                    _signal_group(proc, signal.SIGKILL)
+                    # A process that left the group may still hold the pipes, do not wait for it forever
+                    if not _drain(proc, *writers, 5):
+                        proc.wait()
+    finally:
+        with _live_jobs_lock:
+            _live_jobs.discard(proc)
+    for writer in writers:
+        writer.flush()
+    return proc.returncode
+
+def _execute(job, mem_bytes, timeout_s, cwd=None) -> int:
+    ''' Runs a single (argv, output_file, tag) job, optionally redirecting its stdout to output_file. '''
+    argv, output_file, tag = job
+    try:
+        if output_file is None:
+            return _spawn(argv, mem_bytes, timeout_s, cwd=cwd, tag=tag)
+        fd = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            return _spawn(argv, mem_bytes, timeout_s, stdout=fd, cwd=cwd, tag=tag)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        # E.g. a missing program or cwd, count it as a failed job like the shell would (exit 127)
+        utils.fprint(f"Failed to start \"{' '.join(argv)}\": {e}")
+        return 127
+
+
+class _WorkStealingPool:
+    """
+    Executes jobs on a fixed number of worker threads that stay alive until close().
+
+    Every worker owns a deque. Jobs are distributed round-robin over the deques,
+    a worker pops from the bottom of its own deque and, once it runs dry, steals up to
+    steal_size jobs from the top of a randomly chosen victim. With probability p_steal
+    a worker also steals before taking its next own job, which balances the load when
+    job runtimes differ a lot.
+
+    No locks are needed: deque.pop() and deque.popleft() are atomic, so the owner
+    and the thieves can only collide on the last job, which one of them gets.
+
+    Idle workers sleep on a semaphore that is released once per submitted job, so a
+    worker that went to sleep on empty deques is always woken up.
+    """
+    STEAL_BACKOFF = 1e-4  # seconds
+
+    def __init__(self, max_jobs, steal_size=4, p_steal=1 / 8):
+        self.max_jobs = max_jobs
+        self.steal_size = steal_size
+        self.p_steal = p_steal
+        self.queues = [deque() for _ in range(max_jobs)]
+        self._next_queue = 0
+        self._wakeup = threading.Semaphore(0)
+        self._closed = False
+        # Daemon threads, so a pool that is never closed does not block the interpreter exit
+        self._workers = [threading.Thread(target=self._work, args=(tid,), daemon=True) for tid in range(max_jobs)]
+        for worker in self._workers:
+            worker.start()
+
+    def map(self, fn: Callable, jobs: list) -> List[concurrent.futures.Future]:
+        """
+        Submits fn(job) for every job and returns the futures in the order of jobs.
+        The jobs are started roughly in the given order.
+        """
+        futures = [concurrent.futures.Future() for _ in jobs]
+        # Deal the jobs round-robin, then push each share in reverse with a single extend,
+        # so a worker never sees a partially filled deque with later jobs at the bottom.
+        shares = [[] for _ in range(self.max_jobs)]
+        for future, job in zip(futures, jobs):
+            shares[self._next_queue % self.max_jobs].append((future, fn, job))
+            self._next_queue += 1
+        for queue, share in zip(self.queues, shares):
+            queue.extend(reversed(share))
+        for _ in jobs:
+            self._wakeup.release()
+        return futures
+
+    def _pop_bottom(self, tid):
+        try:
+            return self.queues[tid].pop()
+        except IndexError:
+            return None
+
+    def _steal_from(self, tid, victim) -> bool:
+        """
+        Moves up to steal_size jobs from the top of victim to the top of the worker's own deque.
+        The top holds the jobs submitted last, so stolen jobs keep their place in the submission
+        order and the worker still runs its own earlier (e.g. larger) jobs first.
+        """
+        stolen = []
+        for _ in range(self.steal_size):
+            try:
+                stolen.append(victim.popleft())
+            except IndexError:
+                break
+        if stolen:
+            self.queues[tid].extendleft(reversed(stolen))
+            return True
+        return False
+
+    def _steal(self, tid):
+        """
+        Moves jobs from another deque into the worker's own one.
+        Returns False once every deque is empty.
+        """
+        while True:
+            # Start with a random victim and fall back to all others.
+            start = random.randrange(self.max_jobs)
+            lost_race = False
+            for i in range(self.max_jobs):
+                victim = self.queues[(start + i) % self.max_jobs]
+                if not victim:
+                    continue
+                if self._steal_from(tid, victim):
+                    return True
+                lost_race = True
+            if not lost_race:
+                return False
+            time.sleep(self.STEAL_BACKOFF)
+
+    def _work(self, tid):
+        while True:
+            if self.max_jobs > 1 and random.random() < self.p_steal:
+                victim = random.randrange(self.max_jobs - 1)
+                self._steal_from(tid, self.queues[victim + (victim >= tid)])
+            item = self._pop_bottom(tid)
+            if item is None:
+                # Read the flag before stealing: no job is submitted after close(),
+                # so an unsuccessful sweep after close() means all work is done.
+                closed = self._closed
+                if self._steal(tid):
+                    continue
+                if closed:
+                    return
+                self._wakeup.acquire()
+                continue
+
+            future, fn, job = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(job))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def cancel(self):
+        """
+        Cancels all jobs that have not been started yet.
+        """
+        for queue in self.queues:
+            while True:
+                try:
+                    future, _, _ = queue.popleft()
+                except IndexError:
+                    break
+                future.cancel()
+
+    def close(self):
+        """
+        Lets the workers finish the remaining jobs and stops them.
+        """
+        self._closed = True
+        for _ in range(self.max_jobs):
+            self._wakeup.release()
+        for worker in self._workers:
+            worker.join()
+
+
+# Column indices of result rows stored as tuples in utils.fieldnames order
+GRAPH_COLUMN = utils.fieldnames.index("graph")
+K_COLUMN = utils.fieldnames.index("k")
+
+def _as_row(result) -> tuple:
+    ''' Converts a result dict into a tuple in utils.fieldnames order. '''
+    return tuple(result[name] for name in utils.fieldnames)
 
 
 class AlgorithmRunner:
-    # Configuration parameters for GNU parallel
+    # Configuration parameters for the parallel execution
     MAX_PARALLEL_JOBS = 4  # Leave one core for system
+    # Work stealing: jobs taken per steal and chance to steal while the own deque still has jobs
+    STEAL_SIZE = 4
+    STEAL_PROBABILITY = 1 / 8
 
     def __init__(self, algo_type):
         """
@@ -36,12 +388,30 @@ class AlgorithmRunner:
         """
         self.algo_type = algo_type
         self.program = os.path.expanduser(f"~/deploy/{algo_type}")
+        self._pool = None  # Reused by all runs with the same number of jobs
+
+    def close(self):
+        """
+        Stops the worker threads and kills jobs that are still running. Call this once all runs
+        are done, or when a run was interrupted, so no job outlives the runner.
+        """
+        if self._pool is not None:
+            self._pool.cancel()
+            _kill_live_jobs()
+            self._pool.close()
+            self._pool = None
+
+    def _get_pool(self, max_jobs) -> _WorkStealingPool:
+        if self._pool is None or self._pool.max_jobs != max_jobs:
+            self.close()
+            self._pool = _WorkStealingPool(max_jobs, steal_size=self.STEAL_SIZE, p_steal=self.STEAL_PROBABILITY)
+        return self._pool
 
 
     def run(self, set_name, ordering, hyperparam_dict, param_dict, alg_name, max_cores: Optional[int] = MAX_PARALLEL_JOBS, quick_test=False):
         """
             Runs the algorithm with the given parameters.
-            Creates a temporary file with commands for GNU parallel.
+            Builds the commands for all graphs and k values and executes them in parallel.
             
         Args:
                 set_name (str): Name of the graph set
@@ -58,30 +428,15 @@ class AlgorithmRunner:
             # Für HEIStream und andere Algorithmen die kombinierte Parallelisierungsfunktion
             return self._run_algo_parallel(set_name, ordering, hyperparam_dict, param_dict, alg_name, max_cores, quick_test)
 
-    def _create_command_file(self, commands: List[str], prefix: str = "parallel_cmds") -> str:
-        """
-        Creates a temporary file with commands for GNU parallel.
-        
-        Args:
-            commands: List of command strings to execute
-            prefix: Prefix for the temporary file name
-            
-        Returns:
-            Path to the created temporary file
-        """
-        temp_file = tempfile.NamedTemporaryFile(mode='w', delete=False, prefix=prefix, suffix='.txt')
-        for cmd in commands:
-            temp_file.write(f"{cmd}\n")
-        temp_file.close()
-        return temp_file.name
-
-    def _run_parallel_commands(self, commands: List[str], file_moves, max_jobs) -> bool:
+    def _run_parallel_commands(self, commands: List[tuple], file_moves, max_jobs, cwd=None) -> bool:
         """
-        Execute commands using GNU parallel.
+        Execute commands in parallel using a work-stealing pool of worker threads.
         
         Args:
-            commands: List of command strings to execute
+            commands: List of (argv, output_file, tag) tuples; output_file receives stdout and may be None,
+                      tag prefixes the forwarded output lines of the job
             max_jobs: Maximum number of parallel jobs (defaults to MAX_PARALLEL_JOBS)
+            cwd: Working directory of the commands (defaults to the current one)
             
         Returns:
             True if all commands succeeded, False otherwise
@@ -89,48 +444,30 @@ class AlgorithmRunner:
         if not commands:
             return True
 
-        # Create temporary file with commands
-        cmd_file = self._create_command_file(commands)
+        execute = partial(_execute, mem_bytes=get_memory_limit(max_jobs), timeout_s=get_runtime_limit(), cwd=cwd)
 
-        try:
-            # Construct GNU parallel command
-            parallel_cmd = [
-                "parallel",
-                f"--jobs={max_jobs}",
-                "--line-buffer",  # Preserve line order in output
-                "--tag",          # Tag output with job number
-                "--halt", "never", # Continue even if some jobs fail
-                ":::"              # Separator for arguments
-                # "--arg-file", cmd_file  # Read commands from file instead of command line
-
-            ]
-
-            # Add commands from file
-            with open(cmd_file, 'r') as f:
-                command_lines = [line.strip() for line in f.readlines() if line.strip()]
-
-            parallel_cmd.extend(command_lines)
-
-            if cfg.DEBUG:
-                utils.fprint(f"Running GNU parallel with {len(command_lines)} commands, max {max_jobs} jobs")
-                # utils.fprint(f"{' '.join(parallel_cmd)}")
-
-            # Execute GNU parallel
-            ret = subprocess.run(parallel_cmd, text=True)
-
-            if ret.returncode != 0:
-                utils.fprint(f"WARNING: Some parallel jobs failed (return code: {ret.returncode})")
-                return False
+        if cfg.DEBUG:
+            utils.fprint(f"Running {len(commands)} commands, max {max_jobs} jobs")
 
-            return True
+        pool = self._get_pool(max_jobs)
+        futures = pool.map(execute, commands)
+        try:
+            return_codes = [future.result() for future in futures]
+        except BaseException:
+            # E.g. KeyboardInterrupt: the jobs run in their own sessions and did not get the signal
+            pool.cancel()
+            _kill_live_jobs()
+            raise
+
+        failed = sum(1 for rc in return_codes if rc != 0)
+        if failed:
+            utils.fprint(f"WARNING: {failed} parallel jobs failed")
+            return False
 
-        finally:
-            # Clean up temporary file
-            if os.path.exists(cmd_file):
-                os.unlink(cmd_file)
+        return True
 
     def _run_algo_parallel(self, set_name, ordering, hyperparam_dict, param_dict, alg_name, max_cores, quick_test):
-        """Generalized parallel implementation using GNU parallel"""
+        """Generalized parallel implementation using the work-stealing pool"""
 
         # Flags für algorithmenspezifisches Verhalten
         is_heistream = "heistream" in self.algo_type
@@ -139,7 +476,9 @@ class AlgorithmRunner:
         fbs_output_folder = utils.get_fbs_output_dir(set_name, ordering, alg_name, max_cores)
         # output_folder = os.path.expanduser(os.path.join(f"{cfg.BASE_DIR_OUTPUT}/fbs_{set_name}/{ordering}", f"{max_cores}core{'' if max_cores == 1 else 's'}", alg_name))
         os.makedirs(fbs_output_folder, exist_ok=True)
-        os.chdir(fbs_output_folder)
+
+        # Names of the files already in the output folder (one directory scan instead of a stat per task)
+        existing_files = {entry.name for entry in os.scandir(fbs_output_folder)}
 
         utils.fprint(f"Output folder: {fbs_output_folder}")
 
@@ -150,18 +489,19 @@ class AlgorithmRunner:
         v_k = set_config["k"]
 
         # Nur für new_algo notwendig
-        additional_args_str = "" if is_heistream else " ".join(set_config["additional_args"])
+        additional_args = [] if is_heistream else set_config["additional_args"]
 
         if quick_test:
             graph_set = graph_set[:1]
             v_k = v_k[:1]
 
-        # Prepare all commands for GNU parallel
+        # Prepare all commands for the parallel execution
         commands_to_execute = []
         file_moves = []  # Store file move operations for after execution
 
 
         tasklist: list[utils.Task] = []
+        base_dir_graphs = os.path.expanduser(cfg.BASE_DIR_GRAPHS)
 
         for k in v_k:
             for graph in graph_set:
@@ -185,7 +525,7 @@ class AlgorithmRunner:
 
                 # utils.fprint(f"FBS filename: {fbs_filename}")
 
-                graph_path = os.path.expanduser(os.path.join(cfg.BASE_DIR_GRAPHS, f"{raw_graph_name}.graph"))
+                graph_path = f"{base_dir_graphs}/{raw_graph_name}.graph"
                 task = utils.Task(
                     k=k,
                     raw_graph_name=raw_graph_name,
@@ -198,61 +538,68 @@ class AlgorithmRunner:
 
                 tasklist.append(task)
 
+        # Schedule the largest graphs first, so no big graph is left running alone at the end
+        graph_files = {os.path.basename(task.graph_path) for task in tasklist}
+        try:
+            graph_sizes = {entry.name: entry.stat().st_size for entry in os.scandir(base_dir_graphs) if entry.name in graph_files}
+        except FileNotFoundError:
+            graph_sizes = {}
+        tasklist.sort(key=lambda task: -graph_sizes.get(os.path.basename(task.graph_path), 0))
+
+        if not cfg.OVERWRITE:
+            # Rename results stored under the outdated file name before scheduling
+            for task in tasklist:
+                fbs_filename = os.path.basename(task.fbs_target_path)
+                old_fbs_filename = os.path.basename(task.old_target_path)
+                if old_fbs_filename != fbs_filename and old_fbs_filename in existing_files and fbs_filename not in existing_files:
+                    os.rename(task.old_target_path, task.fbs_target_path)
+                    existing_files.discard(old_fbs_filename)
+                    existing_files.add(fbs_filename)
+                    utils.fprint(f"Renamed {task.old_target_path} to {task.fbs_target_path}")
+
+        # Arguments that are the same for every task
+        const_args = list(additional_args) # Füge additional_args nur für new_algo hinzu
+        for param_name, param_value in param_dict.items():
+            if param_value != "":
+                const_args.append(f"--{param_name}={param_value}")
+            else:
+                const_args.append(f"--{param_name}")
+        for hyperparam_name, hyperparam_value in hyperparam_dict.items():
+            const_args.append(f"--{hyperparam_name}={hyperparam_value}")
+
         for task in tasklist:
             # utils.fprint(f"Task: {task}")
 
             fbs_target_path = task.fbs_target_path
             old_target_path = task.old_target_path
             raw_graph_name = task.raw_graph_name
+            fbs_filename = os.path.basename(fbs_target_path)
+            old_fbs_filename = os.path.basename(old_target_path)
 
             if cfg.OVERWRITE:
-                if os.path.exists(fbs_target_path):
+                if fbs_filename in existing_files:
                     utils.fprint(f"File {fbs_target_path} already exists, removing it.")
                     os.remove(fbs_target_path)
-                if os.path.exists(old_target_path):
+                    existing_files.discard(fbs_filename)
+                if old_fbs_filename in existing_files:
                     utils.fprint(f"File {old_target_path} already exists, removing it.")
                     os.remove(old_target_path)
+                    existing_files.discard(old_fbs_filename)
             else:
                 # Check if the file already exists in the output folder
-                if os.path.exists(fbs_target_path):
+                if fbs_filename in existing_files:
                     utils.fprint(f"File {fbs_target_path} already exists, skipping.")
                     continue
-                elif os.path.exists(old_target_path):
-                    utils.fprint(f"File {old_target_path} already exists, skipping.")
-                    # If the old file exists, we can rename it to the new name
-                    os.rename(old_target_path, fbs_target_path)
-                    utils.fprint(f"Renamed {old_target_path} to {fbs_target_path}")
-                    continue
 
             # Build command
-
-            base_command = [
-                self.program,
-                task.graph_path,
-                f"--k={task.k}",
-                "--write_log",
-            ]
-
-            # Füge additional_args_str nur für new_algo hinzu
-            if not is_heistream and additional_args_str:
-                base_command.append(f"{additional_args_str}")
-
-            for param_name, param_value in param_dict.items():
-                if param_value != "":
-                    base_command.append(f"--{param_name}={param_value}")
-                else:
-                    base_command.append(f"--{param_name}")
-
-            for hyperparam_name, hyperparam_value in hyperparam_dict.items():
-                base_command.append(f"--{hyperparam_name}={hyperparam_value}")
-
-            command_str = " ".join(base_command)
-            commands_to_execute.append(f"{get_runtime_and_memory_limit_prefix(max_cores)}{command_str}")
+            base_command = [self.program, task.graph_path, f"--k={task.k}", "--write_log", *const_args]
+            commands_to_execute.append((base_command, None, f"{task.raw_graph_name} k={task.k}"))
 
         if commands_to_execute:
-            # Execute all commands using GNU parallel
+            # Execute all commands in parallel
             utils.fprint(f"Executing {len(commands_to_execute)} commands in parallel...")
-            success = self._run_parallel_commands(commands_to_execute, file_moves, max_jobs=max_cores)
+            # The programs write their FBS logs into the working directory
+            success = self._run_parallel_commands(commands_to_execute, file_moves, max_jobs=max_cores, cwd=fbs_output_folder)
 
             if not success:
                 utils.fprint("Some commands failed during parallel execution")
@@ -262,11 +609,10 @@ class AlgorithmRunner:
             utils.fprint(f"Done running experiments for {alg_name}")
             convert_fbs_to_csv.main(tasklist, alg_name, set_name, ordering, max_cores)
 
-        os.chdir("/home/lbaumgaertner/scripts")
         return True
 
     def _run_cuttana_parallel(self, set_name, ordering, hyperparam_dict, param_dict, alg_name, max_cores, quick_test):
-        """Implementation of run_cuttana with GNU parallel"""
+        """Implementation of run_cuttana using the work-stealing pool"""
 
         graph_set = utils.read_graph_set(set_name)
 
@@ -287,26 +633,43 @@ class AlgorithmRunner:
         os.makedirs(processed_output_dir, exist_ok=True)
 
         # Check if file exists and read existing data
+        # Rows are tuples in utils.fieldnames order
         existing_data_rows = []
         if os.path.exists(output_csv_path):
             if not cfg.OVERWRITE:
-                with open(output_csv_path, 'r') as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    for row in reader:
-                        row["k"] = int(row["k"])
-                        if row["k"] in v_k:
-                            existing_data_rows.append(row)
+                with open(output_csv_path, 'r', newline='') as csvfile:
+                    reader = csv.reader(csvfile)
+                    header = next(reader, None)
+                    missing = [name for name in utils.fieldnames if name not in header] if header else []
+                    if missing:
+                        utils.fprint(f"WARNING: {output_csv_path} lacks the columns {', '.join(missing)}, ignoring its results")
+                    elif header:
+                        columns = [header.index(name) for name in utils.fieldnames]
+                        last_column = max(columns)
+                        k_values = set(v_k)
+                        for row in reader:
+                            if len(row) <= last_column:
+                                continue  # Empty or truncated row
+                            row = [row[i] for i in columns]
+                            row[K_COLUMN] = int(row[K_COLUMN])
+                            if row[K_COLUMN] in k_values:
+                                existing_data_rows.append(tuple(row))
             else:
                 utils.fprint(f"Overwriting existing CSV file: {output_csv_path}")
                 os.remove(output_csv_path)
 
+        # (graph, k) pairs that already have a result
+        existing_keys = {(row[GRAPH_COLUMN], row[K_COLUMN]) for row in existing_data_rows}
+
         # Create temp_results directory structure
         temp_results_dir = os.path.join(processed_output_dir, "temp_results")
         alg_temp_dir = os.path.join(temp_results_dir, alg_name)
         os.makedirs(alg_temp_dir, exist_ok=True)
+        existing_temp_files = {entry.name for entry in os.scandir(alg_temp_dir)}
 
-        # Prepare commands for GNU parallel
+        # Prepare commands for the parallel execution
         commands_to_execute = []
+        base_dir_graphs = os.path.expanduser(cfg.BASE_DIR_GRAPHS)
         task_infos = [] # Store task information for result processing
 
         for graph in graph_set:
@@ -314,13 +677,14 @@ class AlgorithmRunner:
                 raw_graph_name = utils.get_graph_name(graph, ordering) # Add ordering if not natural
 
                 # Check if results already exist in existing_data_rows
-                if not cfg.OVERWRITE and any(row["graph"] == raw_graph_name and row["k"] == k for row in existing_data_rows):
+                if not cfg.OVERWRITE and (raw_graph_name, k) in existing_keys:
                     utils.fprint(f"Results for {raw_graph_name} with k={k} already exist in CSV, skipping.")
                     continue
 
                 # Check if results already exist in temp_results/alg_name/graph_k.txt
-                temp_result_file = os.path.join(alg_temp_dir, f"{raw_graph_name}_{k}.txt")
-                if os.path.exists(temp_result_file) and not cfg.OVERWRITE:
+                temp_result_filename = f"{raw_graph_name}_{k}.txt"
+                temp_result_file = os.path.join(alg_temp_dir, temp_result_filename)
+                if temp_result_filename in existing_temp_files and not cfg.OVERWRITE:
                     try:
                         with open(temp_result_file, 'r') as f:
                             content = f.read().strip()
@@ -330,6 +694,7 @@ class AlgorithmRunner:
                                 if len(parts) >= 4:
                                     runtime, memory, edge_cut, edge_cut_ratio = parts[:4]
                                     # Append to existing_data_rows
+                                    # edge_cut stays the str token of the temp file, produce_result handles "0" as failed
                                     result = utils.produce_result(
                                         alg_name=alg_name,
                                         graph=raw_graph_name,
@@ -341,7 +706,8 @@ class AlgorithmRunner:
                                         ECR=edge_cut_ratio
                                     )
 
-                                    existing_data_rows.append(result)
+                                    existing_data_rows.append(_as_row(result))
+                                    existing_keys.add((raw_graph_name, k))
 
                                     utils.fprint(f"Results for {raw_graph_name} with k={k} loaded from temp file, skipping.")
                                     continue
@@ -360,7 +726,7 @@ class AlgorithmRunner:
 
 
                 # CutTana verwendet .cut-Dateien
-                graph_path = os.path.expanduser(os.path.join(cfg.BASE_DIR_GRAPHS, f"{raw_graph_name}.cut"))
+                graph_path = f"{base_dir_graphs}/{raw_graph_name}.cut"
 
                 # Build command
                 base_command = [
@@ -392,16 +758,14 @@ class AlgorithmRunner:
 
                 utils.fprint(f"Running: \"{' '.join(base_command)}\"")
 
-                # Add output redirection to temp file using tee to show output and save to file
-                suffix = f' | tee {temp_result_file}'
-                command_str = get_runtime_and_memory_limit_prefix(max_cores) + " ".join(base_command) + suffix
-                commands_to_execute.append(command_str)
+                # Output is written directly to the temp file
+                commands_to_execute.append((base_command, temp_result_file, f"{raw_graph_name} k={k}"))
                 task_infos.append({'graph_name': raw_graph_name, 'k': k, 'temp_file': temp_result_file})
 
         if commands_to_execute:
             utils.fprint(f"Executing {len(commands_to_execute)} Cuttana commands in parallel...")
 
-            # Execute commands with GNU parallel
+            # Execute commands in parallel
             success = self._run_parallel_commands(commands_to_execute, [], max_jobs=max_cores)
 
             # Read results from temp files and add to existing_data_rows
@@ -417,8 +781,8 @@ class AlgorithmRunner:
                                 parts = line.split()
                                 if len(parts) >= 4:
                                     runtime, memory, edge_cut, solution_quality = parts[:4]
-                                    task_successful = "1" if str(edge_cut) != "0" else "0"
-                                    existing_data_rows.append({
+                                    task_successful = "1" if edge_cut != "0" else "0" # edge_cut is already a str token
+                                    existing_data_rows.append(_as_row({
                                         "alg_name": alg_name,
                                         "graph": task['graph_name'],
                                         "seed": "0",
@@ -428,7 +792,7 @@ class AlgorithmRunner:
                                         "solution_quality": solution_quality,
                                         "edge_cut": edge_cut,
                                         "success": task_successful
-                                    })
+                                    }))
                                     utils.fprint(f"[SUCCESS] {task['graph_name']} k={task['k']}: Runtime={runtime}, Memory={memory}, EdgeCut={edge_cut}, Quality={solution_quality}")
                                     parsed_result_file_successfully = True
                                 else:
@@ -443,16 +807,16 @@ class AlgorithmRunner:
                         f.write("0 0 0 0")
 
                     failed_result = utils.produce_failed_result(alg_name=alg_name, graph=task['graph_name'], k=task['k'])
-                    existing_data_rows.append(failed_result)
+                    existing_data_rows.append(_as_row(failed_result))
                     utils.fprint(f"[FAILURE] {task['graph_name']} k={task['k']}: No valid result found")
 
         # Write final consolidated CSV
         if not quick_test and existing_data_rows:
-            existing_data_rows.sort(key=lambda x: (x["graph"], x["k"]))
+            existing_data_rows.sort(key=lambda row: (row[GRAPH_COLUMN], row[K_COLUMN]))
 
             with open(output_csv_path, 'w', newline='') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=utils.fieldnames)
-                writer.writeheader()
+                writer = csv.writer(csvfile)
+                writer.writerow(utils.fieldnames)
                 writer.writerows(existing_data_rows)
 
             utils.fprint(f"CSV-file '{output_csv_path}' was successfully created for {alg_name}")
@@ -1,8 +1,15 @@
 #!/usr/bin/env python3
 import os
 import csv
+import math
+import struct
+import heapq
+import tempfile
+import concurrent.futures
+from functools import partial
 from typing import List
 # import argparse
+import flatbuffers
 import config as cfg
 import utils
 
@@ -11,54 +18,148 @@ from PartitionInfo import PartitionLog
 # import fbs.PartitionInfo.PartitionLog as PartitionLog
 
 
-def parse_flatbuffer_file(file_path, alg_name, set_name):
+# Struct readers for the little-endian FlatBuffers wire format.
+_U16 = struct.Struct("<H").unpack_from
+_U32 = struct.Struct("<I").unpack_from
+_I32 = struct.Struct("<i").unpack_from
+_I64 = struct.Struct("<q").unpack_from
+_U64 = struct.Struct("<Q").unpack_from
+_F64 = struct.Struct("<d").unpack_from
+
+# Vtable slots of the fields that are read (see the generated PartitionInfo classes).
+_ROOT_SLOTS = (4, 6, 8, 10, 12)     # GraphMetadata, PartitionConfiguration, Runtime, MemoryConsumption, Metrics
+_GRAPH_META_SLOTS = (4, 8)          # filename, num_edges
+_CONFIG_SLOTS = (4, 6)              # k, seed
+_RUNTIME_SLOTS = (12,)              # total_time
+_MEMORY_SLOTS = (4,)                # max_rss
+_METRICS_SLOTS = (4,)               # edge_cut
+
+# Field offsets per (vtable, slots). All files written by the same program share their vtables.
+_field_offset_cache = {}
+
+
+def _field_positions(buf, table_pos, slots):
     """
-    Reads a Flatbuffers binary file and extracts the desired fields
-    to create a row in CSV format.
+    Returns the absolute positions of the given fields of a table.
+    Fields that are not stored in the buffer (default values) get the position None.
     """
-    with open(file_path, 'rb') as f:
-        buf = f.read()
+    vtable_pos = table_pos - _I32(buf, table_pos)[0]
+    vtable_size = _U16(buf, vtable_pos)[0]
+    key = (buf[vtable_pos:vtable_pos + vtable_size], slots)
+    offsets = _field_offset_cache.get(key)
+    if offsets is None:
+        offsets = tuple(_U16(buf, vtable_pos + slot)[0] if slot < vtable_size else 0 for slot in slots)
+        _field_offset_cache[key] = offsets
+    return [table_pos + offset if offset else None for offset in offsets]
 
-    # Get the root object (PartitionLog) from the buffer.
-    partition_log = PartitionLog.PartitionLog.GetRootAsPartitionLog(buf, 0)
 
-    # 1. Algorithm name: Taken from the parameter.
-    # (Here, the passed value is used.)
+def _scalar(unpack, buf, pos, default=0):
+    return unpack(buf, pos)[0] if pos is not None else default
 
-    # 2. Graph: From GraphMetadata.filename, we extract the pure graph name.
-    graph_meta = partition_log.GraphMetadata()
-    graph_name = graph_meta.Filename().decode('utf-8') if graph_meta.Filename() else ""
 
+def _read_fields_fast(buf):
+    """
+    Reads (graph_name, seed, k, runtime, memory, edge_cut, num_edges) with plain struct reads.
+    Returns None if a sub-table or the filename is missing.
+    """
+    root = _field_positions(buf, _U32(buf, 0)[0], _ROOT_SLOTS)
+    if None in root:
+        return None
+    meta_pos, config_pos, runtime_pos, memory_pos, metrics_pos = [pos + _U32(buf, pos)[0] for pos in root]
+
+    meta = _field_positions(buf, meta_pos, _GRAPH_META_SLOTS)
+    config = _field_positions(buf, config_pos, _CONFIG_SLOTS)
+    runtime = _field_positions(buf, runtime_pos, _RUNTIME_SLOTS)
+    memory = _field_positions(buf, memory_pos, _MEMORY_SLOTS)
+    metrics = _field_positions(buf, metrics_pos, _METRICS_SLOTS)
+    if meta[0] is None:
+        return None
 
+    filename_pos = meta[0] + _U32(buf, meta[0])[0]
+    filename_len = _U32(buf, filename_pos)[0]
+    graph_name = buf[filename_pos + 4:filename_pos + 4 + filename_len].decode('utf-8')
+
+    return (
+        graph_name,
+        _scalar(_I32, buf, config[1]),
+        _scalar(_U32, buf, config[0]),
+        _scalar(_F64, buf, runtime[0], 0.0),
+        _scalar(_I64, buf, memory[0]),
+        _scalar(_I32, buf, metrics[0]),
+        _scalar(_U64, buf, meta[1]),
+    )
 
-    # 3. Seed: From PartitionConfiguration
-    config = partition_log.PartitionConfiguration()
-    seed = config.Seed()
 
-    # Num partitions:
-    k = config.K()
+def _sub_table(tab, slot):
+    o = tab.Offset(slot)
+    if o == 0:
+        raise ValueError(f"Table at vtable slot {slot} is missing")
+    return flatbuffers.table.Table(tab.Bytes, tab.Indirect(o + tab.Pos))
 
-    if not k in cfg.SET_CONFIG[set_name]["k"]:
-        # print(f"Warning: k={k} is not in the set configuration for {set_name}. Skipping this entry.")
-        return None
 
+def _get(tab, flags, slot, default=0):
+    o = tab.Offset(slot)
+    return tab.Get(flags, o + tab.Pos) if o != 0 else default
+
+
+def _read_fields(buf):
+    """
+    Reads (graph_name, seed, k, runtime, memory, edge_cut, num_edges) with flatbuffers table lookups.
+    The slots are the ones used by the generated PartitionInfo accessors.
+    """
+    N = flatbuffers.number_types
+
+    # Get the root table (PartitionLog) from the buffer.
+    tab = PartitionLog.PartitionLog.GetRootAs(buf, 0)._tab
 
+    # 1. Algorithm name: Taken from the parameter.
+    # (Here, the passed value is used.)
+
+    # 2. Graph: From GraphMetadata.filename, we extract the pure graph name.
+    graph_meta = _sub_table(tab, 4)
+    o = graph_meta.Offset(4)
+    graph_name = graph_meta.String(o + graph_meta.Pos).decode('utf-8') if o != 0 else ""
+
+    # 3. Seed: From PartitionConfiguration
+    config = _sub_table(tab, 6)
+    seed = _get(config, N.Int32Flags, 6)
+
+    # Num partitions:
+    k = _get(config, N.Uint32Flags, 4)
 
     # 4. Runtime: Here we use the total time value from RunTime.total_time.
-    runtime_table = partition_log.Runtime()
-    runtime = runtime_table.TotalTime()
+    runtime = _get(_sub_table(tab, 8), N.Float64Flags, 12, 0.0)
 
     # 5. Memory: From MemoryConsumption.max_rss
-    mem = partition_log.MemoryConsumption()
-    memory = mem.MaxRss()
+    memory = _get(_sub_table(tab, 10), N.Int64Flags, 4)
 
     # 6. Solution Quality: Here we use the Balance value from PartitionMetrics.
-    metrics = partition_log.Metrics()
-    edge_cut = metrics.EdgeCut()
+    edge_cut = _get(_sub_table(tab, 12), N.Int32Flags, 4)
+
+    return graph_name, seed, k, runtime, memory, edge_cut, _get(graph_meta, N.Uint64Flags, 8)
+
+
+def parse_flatbuffer_file(file_path, alg_name, set_name):
+    """
+    Reads a Flatbuffers binary file and extracts the desired fields
+    to create a row in CSV format.
+    """
+    with open(file_path, 'rb') as f:
+        buf = f.read()
+
+    fields = _read_fields_fast(buf)
+    if fields is None:
+        fields = _read_fields(buf)
+    graph_name, seed, k, runtime, memory, edge_cut, num_edges = fields
+
+    if not k in cfg.SET_CONFIG[set_name]["k"]:
+        # print(f"Warning: k={k} is not in the set configuration for {set_name}. Skipping this entry.")
+        return None
 
     # 7. Edge Cut Ratio (ECR): Calculated as the edge cut divided by the total number of edges.
-    ECR = metrics.EdgeCut() / graph_meta.NumEdges()
+    ECR = edge_cut / num_edges
 
+    # edge_cut is the int read from the FBS file, produce_result handles 0 as failed
     return utils.produce_result(
         alg_name=alg_name,
         graph=graph_name,
@@ -71,6 +172,48 @@ def parse_flatbuffer_file(file_path, alg_name, set_name):
     )
 
 
+def _parse_one(task: utils.Task, alg_name, set_name):
+    """
+    Parses the FBS file of a single task. Returns a failed result if the file
+    is missing or cannot be parsed.
+    """
+    fbs_target_path = task.fbs_target_path
+    if os.path.exists(fbs_target_path):
+        try:
+            data = parse_flatbuffer_file(fbs_target_path, alg_name, set_name)
+            if data is not None:
+                return data
+        except Exception as e:
+            print(f"Error processing {fbs_target_path}: {e}")
+
+    return utils.produce_failed_result(alg_name, task.raw_graph_name, task.k)
+
+
+# Maximum number of tasks whose rows are sorted and written to one shard file.
+MAX_SHARD_SIZE = 256
+
+
+def _row_key(row):
+    return row["graph"], int(row["k"])
+
+
+def _parse_shard(shard, alg_name, set_name, shard_dir):
+    """
+    Parses the FBS files of a shard of tasks and writes the rows, sorted by graph and k,
+    to a CSV file in shard_dir. Returns the path of that file.
+    """
+    shard_index, tasks = shard
+    data_rows = [_parse_one(task, alg_name, set_name) for task in tasks]
+    data_rows.sort(key=_row_key)
+
+    shard_file = os.path.join(shard_dir, f"results_{shard_index}.csv")
+    with open(shard_file, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=utils.fieldnames)
+        writer.writeheader()
+        writer.writerows(data_rows)
+    return shard_file
+
+
 def main(tasklist: List[utils.Task], alg_name, set_name, ordering, max_cores):
 
     # Compose input directory (expand the ~ path)
@@ -87,38 +230,36 @@ def main(tasklist: List[utils.Task], alg_name, set_name, ordering, max_cores):
     os.makedirs(processed_output_dir, exist_ok=True)
     # Define the CSV columns (header)
 
-    data_rows = []
-
     if not os.path.exists(fbs_dir):
         print(f"The input directory '{fbs_dir}' does not exist!")
         return
 
-    for task in tasklist:
-        successful = False
-        fbs_target_path = task.fbs_target_path
-        if os.path.exists(fbs_target_path):
-            try:
-                data = parse_flatbuffer_file(fbs_target_path, alg_name, set_name)
-                if data is not None:
-                    data_rows.append(data)
-                    successful = True
-            except Exception as e:
-                print(f"Error processing {fbs_target_path}: {e}")
-                pass
-
-        if not successful:
-            data_rows.append(utils.produce_failed_result(alg_name, task.raw_graph_name, task.k))
-
-
-    # Sort the data by the "k" value.
-    data_rows.sort(key=lambda x: x["k"])
-    data_rows.sort(key=lambda x: x["graph"])
-
-    # Write the collected data to the CSV file.
-    with open(output_csv, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=utils.fieldnames)
-        writer.writeheader()
-        writer.writerows(data_rows)
+    # Every file is parsed independently, so split the tasks into one shard per core
+    # (a set has fewer than 100 tasks, a fixed shard size would give a single shard).
+    # Use no more cores than the run itself, with --jobs several runs convert at the same time.
+    workers = max(1, min(os.cpu_count() or 1, max_cores or 1))
+    shard_size = max(1, min(MAX_SHARD_SIZE, math.ceil(len(tasklist) / workers)))
+    shards = [(i, tasklist[start:start + shard_size]) for i, start in enumerate(range(0, len(tasklist), shard_size))]
+
+    with tempfile.TemporaryDirectory(prefix=f"{alg_name}_", dir=processed_output_dir) as shard_dir:
+        parse_shard = partial(_parse_shard, alg_name=alg_name, set_name=set_name, shard_dir=shard_dir)
+        if len(shards) <= 1:
+            # Not worth forking worker processes
+            shard_files = [parse_shard(shard) for shard in shards]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+                shard_files = list(executor.map(parse_shard, shards))
+
+        # Merge the sorted shards (by graph and k) into the CSV file.
+        shard_handles = [open(shard_file, newline='') for shard_file in shard_files]
+        try:
+            with open(output_csv, 'w', newline='') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=utils.fieldnames)
+                writer.writeheader()
+                writer.writerows(heapq.merge(*[csv.DictReader(f) for f in shard_handles], key=_row_key))
+        finally:
+            for f in shard_handles:
+                f.close()
 
     print(f"CSV file '{output_csv}' was created successfully.")
 
@@ -5,28 +5,69 @@ import argparse
 import subprocess
 import sys
 import os
+import shutil
+import hashlib
+import orjson
+import concurrent.futures
 
-from datetime import datetime
-from utils import get_algo_name_new, print_configuration_newest, fprint, read_config_file, print_configuration_new
+from graphlib import TopologicalSorter
+
+from utils import get_algo_name_new, print_configuration_newest, fprint, read_config_file, print_configuration_new, merge_configurations, get_today, OUTPUTS_DIR, prefetch_graph_sets, print_configuration_batch, write_json_atomic
 import config as cfg
 from algo_runner import AlgorithmRunner
 
+CHECKPOINT_DIR = os.path.join(OUTPUTS_DIR, "checkpoints")
+
+def get_checkpoint_file(config_data, theme) -> str:
+    ''' Returns the checkpoint file of a config, a changed config gets a new one. '''
+    cfg_hash = hashlib.sha1(orjson.dumps(config_data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    return os.path.join(CHECKPOINT_DIR, f"{theme}-{cfg_hash}.json")
+
+def load_checkpoint(checkpoint_file) -> set:
+    ''' Returns the (alg_name, ordering, set_name, max_cores) keys of the completed runs. '''
+    try:
+        with open(checkpoint_file, "rb") as f:
+            return {tuple(key) for key in orjson.loads(f.read())}
+    except FileNotFoundError:
+        return set()
+
+def save_checkpoint(checkpoint_file, completed) -> None:
+    ''' Writes the completed runs via a temporary file, so a crash never leaves a broken checkpoint. '''
+    os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)
+    write_json_atomic(checkpoint_file, sorted(completed))
+
 
 def main():
     parser = argparse.ArgumentParser(description="Run experiments based on a JSON config file.")
-    parser.add_argument("--config", required=True, help="Path to the JSON config file")
+    parser.add_argument("--config", help="Path to the JSON config file")
     parser.add_argument("--clean_config", default=False, action="store_true", help="Clean the configuration and exit")
     parser.add_argument("--create_config", default=False, action="store_true", help="Print the configuration and exit")
+    parser.add_argument("--merge", default=False, action="store_true", help="Merge the configurations of all themes and exit")
+    parser.add_argument("--config_dir", help="Print the configuration of every config file in this directory at once and exit")
     parser.add_argument("--quick_test", default=False, action="store_true", help="Perform a quick test over all algorithms")
+    parser.add_argument("--resume", default=False, action="store_true", help="Skip the runs completed by a previous call with the same config")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of runs executed at the same time")
     args = parser.parse_args()
 
     if args.clean_config:
-        today = datetime.today().strftime('%Y-%m-%d')
-        output_config = os.path.expanduser(f"~/outputs/{today}.json")
+        today = get_today()
+        output_config = os.path.join(OUTPUTS_DIR, f"{today}.json")
         if os.path.exists(output_config):
             os.remove(output_config)
+        shutil.rmtree(os.path.join(OUTPUTS_DIR, today), ignore_errors=True)
         return
 
+    if args.merge:
+        merge_configurations()
+        return
+
+    if args.config_dir is not None:
+        print_configuration_batch(args.config_dir)
+        return
+
+    if args.config is None:
+        parser.error("the following arguments are required: --config")
+
     # Load the configuration file
     config_data = read_config_file(args.config)
 
@@ -54,6 +95,20 @@ def main():
         # return
     # params = config_data.get("hyperparams", [])
 
+    # Read all graph sets once before starting, forked --jobs workers inherit them
+    prefetch_graph_sets(orderings)
+
+    # Quick tests are not recorded, they do not complete a run
+    checkpoint_file = None if args.quick_test else get_checkpoint_file(config_data, theme)
+    completed = load_checkpoint(checkpoint_file) if args.resume and checkpoint_file else set()
+    if completed:
+        fprint(f"Resuming from {checkpoint_file} ({len(completed)} runs completed)")
+
+    if args.jobs > 1:
+        run_exp_parallel(orderings, configurations, args.jobs, quick_test=args.quick_test,
+                         checkpoint_file=checkpoint_file, completed=completed)
+        return
+
     # Führe Experimente für jede Konfiguration aus
     for config in configurations:
         # Extrahiere den Algorithmus aus jeder Konfiguration
@@ -73,7 +128,11 @@ def main():
         runner = AlgorithmRunner(algo)
 
         # Wir übergeben nur eine Konfiguration und nicht die gesamte Liste
-        run_exp_for_ordering_and_set(algo, runner, orderings, [config], quick_test=args.quick_test)
+        try:
+            run_exp_for_ordering_and_set(algo, runner, orderings, [config], quick_test=args.quick_test,
+                                         checkpoint_file=checkpoint_file, completed=completed)
+        finally:
+            runner.close()
 
         if args.quick_test:
             fprint(f"\n################ FINISHED QUICK TEST for {algo} ################\n")
@@ -83,34 +142,134 @@ def main():
 
 
 
-def run_exp_for_ordering_and_set(algo: str, runner: AlgorithmRunner, orderings: dict, configurations: list, quick_test=False):
+def collect_runs(algo: str, orderings: dict, configurations: list):
+    ''' Yields (ordering, set_name, alg_name, hyperparam_dict, param_dict, max_cores) for every enabled run. '''
+    for configuration in configurations:
+        hyperparams = configuration.get("hyperparams", {})
+        param_dict = configuration.get("params", {})
+        hyperparam_names = tuple(hyperparams)
+        max_cores = configuration.get("max_cores", 4)
+
+        # Names and hyperparameters only depend on the configuration, not on ordering and set
+        runs = []
+        for conf in configuration["to_run"]:
+            alg_name = get_algo_name_new(algo, conf, hyperparams, param_dict)
+            if alg_name is None:
+                continue
+
+            # Generate dict from param names and values
+            hyperparam_dict = dict(zip(hyperparam_names, conf.split()))
+            runs.append((alg_name, hyperparam_dict))
+
+        for ordering, sets in orderings.items():
+
+            for set_name, set_enabled in sets.items():
+
+                if not set_enabled:
+                    continue
+
+                for alg_name, hyperparam_dict in runs:
+                    yield ordering, set_name, alg_name, hyperparam_dict, param_dict, max_cores
+
+
+def run_exp_for_ordering_and_set(algo: str, runner: AlgorithmRunner, orderings: dict, configurations: list, quick_test=False,
+                                 checkpoint_file=None, completed=None):
     # Run experiments for each enabled set and ordering.
-    for ordering, sets in orderings.items():
+    for ordering, set_name, alg_name, hyperparam_dict, param_dict, max_cores in collect_runs(algo, orderings, configurations):
+        key = (alg_name, ordering, set_name, max_cores)
+        if completed is not None and key in completed:
+            fprint(f"Skipping \'{alg_name}\' with ordering \'{ordering}\' for set \'{set_name}\', already completed")
+            continue
+
+        fprint(f"\n# ----- Running \'{alg_name}\' with ordering \'{ordering}\' for set \'{set_name}\' ----- #")
+
+        # fprint(algo, set_name, ordering, hyperparam_dict, param_dict, alg_name)
+        runner.run(set_name, ordering, hyperparam_dict, param_dict, alg_name, max_cores, quick_test)
+
+        if checkpoint_file is not None:
+            completed.add(key)
+            save_checkpoint(checkpoint_file, completed)
+
+
+def _run_in_process(algo, set_name, ordering, hyperparam_dict, param_dict, alg_name, max_cores, quick_test) -> None:
+    ''' Executes a single run in a worker process of run_exp_parallel. '''
+    fprint(f"\n# ----- Running \'{alg_name}\' with ordering \'{ordering}\' for set \'{set_name}\' ----- #")
+    runner = AlgorithmRunner(algo)
+    try:
+        runner.run(set_name, ordering, hyperparam_dict, param_dict, alg_name, max_cores, quick_test)
+    finally:
+        runner.close()
+
 
-        for set_name, set_enabled in sets.items():
+def run_exp_parallel(orderings: dict, configurations: list, jobs: int, quick_test=False, checkpoint_file=None, completed=None):
+    '''
+    Runs the experiments of all configurations with up to jobs runs at the same time.
+    Runs writing to the same output folder depend on each other and are executed one after another,
+    all other runs are independent.
+    '''
+    runs = []
+    sorter = TopologicalSorter()
+    last_run = {}  # key -> index of the last run writing to the same output
 
-            if not set_enabled:
+    for configuration in configurations:
+        algo = configuration.get("algo")
+
+        if quick_test and algo.startswith("cuttana"):
+            fprint("No Quick Test with Cuttana.")
+            continue
+
+        for ordering, set_name, alg_name, hyperparam_dict, param_dict, max_cores in collect_runs(algo, orderings, [configuration]):
+            key = (alg_name, ordering, set_name, max_cores)
+            if completed is not None and key in completed:
+                fprint(f"Skipping \'{alg_name}\' with ordering \'{ordering}\' for set \'{set_name}\', already completed")
                 continue
 
-            for configuration in configurations:
-                hyperparams = configuration.get("hyperparams", {})
-                param_dict = configuration.get("params", {})
-                hyperparam_names = list(hyperparams.keys())
-                max_cores = configuration.get("max_cores", 4)
+            index = len(runs)
+            runs.append((key, (algo, set_name, ordering, hyperparam_dict, param_dict, alg_name, max_cores, quick_test)))
+            if key in last_run:
+                sorter.add(index, last_run[key])
+            else:
+                sorter.add(index)
+            last_run[key] = index
+
+    if not runs:
+        return
+
+    # Every run uses up to max_cores cores itself
+    widest_run = max(key[3] for key, _ in runs)
+    max_workers = max(1, min(jobs, (os.cpu_count() or 1) // widest_run))
+    fprint(f"\n################ RUNNING {len(runs)} EXPERIMENTS, {max_workers} at a time ################\n")
+
+    sorter.prepare()
+    error = None
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        # After a failure no new runs are started, but the running ones are still waited for and recorded
+        while running or (error is None and sorter.is_active()):
+            if error is None:
+                for index in sorter.get_ready():
+                    running[executor.submit(_run_in_process, *runs[index][1])] = index
+
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            finished = 0
+            for future in done:
+                index = running.pop(future)
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                sorter.done(index)
+                finished += 1
 
-                for conf in configuration["to_run"]:
-                    alg_name = get_algo_name_new(algo, conf, hyperparams, param_dict)
-                    if alg_name is None:
-                        continue
+                if checkpoint_file is not None:
+                    completed.add(runs[index][0])
 
-                    fprint(f"\n# ----- Running \'{alg_name}\' with ordering \'{ordering}\' for set \'{set_name}\' ----- #")
+            if checkpoint_file is not None and finished:
+                save_checkpoint(checkpoint_file, completed)
 
-                    # Generate dict from param names and values
-                    hyperparam_values = conf.split()
-                    hyperparam_dict = dict(zip(hyperparam_names, hyperparam_values))
+    if error is not None:
+        raise error
 
-                    # fprint(algo, set_name, ordering, hyperparam_dict, param_dict, alg_name)
-                    runner.run(set_name, ordering, hyperparam_dict, param_dict, alg_name, max_cores, quick_test)
+    fprint(f"\n#################### FINISHED {len(runs)} EXPERIMENTS ####################\n")
 
 
 if __name__ == "__main__":
@@ -1,44 +1,63 @@
-import json
 import os
-import math
+import glob
+import re
 import sys
+import functools
 import commentjson
+import orjson
 import config as cfg
 from datetime import datetime
+from pathlib import Path
 
 ''' This module contains utility functions used by the experiment scripts. '''
 
+# Paths are expanded once at import instead of on every call
+HOME = os.path.expanduser("~")
+OUTPUTS_DIR = os.path.join(HOME, "outputs")
+_GRAPH_SETS_DIR = os.path.join(HOME, "scripts/exp/graph_sets")
+_BASE_DIR_OUTPUT = os.path.expanduser(cfg.BASE_DIR_OUTPUT)
+_BASE_DIR_PROCESSED_OUTPUT = os.path.expanduser(cfg.BASE_DIR_PROCESSED_OUTPUT)
+
+@functools.lru_cache(maxsize=None)
+def get_today() -> str:
+    ''' Returns the date of the first call, so all outputs of one process share it. '''
+    return datetime.today().strftime('%Y-%m-%d')
+
 def fprint(*args, **kwargs):
     ''' Print function that flushes the output. '''
     print(*args, **kwargs, flush=True)
 
-def read_graph_set(set_name) -> list:
-    ''' Reads the graph set from the file: graph_sets/<set_name> '''
+@functools.lru_cache(maxsize=None)
+def read_graph_set(set_name) -> tuple:
+    ''' Reads the graph set from the file: graph_sets/<set_name> (cached, every run of a set reads the same file) '''
 
-    base_path = os.path.expanduser("~/scripts/exp/")
-    graph_set_file = os.path.join(base_path, "graph_sets", set_name)
+    graph_set_file = os.path.join(_GRAPH_SETS_DIR, set_name)
     try:
-        with open(graph_set_file, "r") as f:
-            graph_set = [line.strip() for line in f if line.strip()]
+        # Graph names contain no whitespace, so one split drops empty lines as well
+        graph_set = tuple(Path(graph_set_file).read_text().split())
     except FileNotFoundError:
         print(f"Graph set file not found: {graph_set_file}")
         sys.exit(1)
     return graph_set
 
+# Suffix of the graph file for each ordering
+_ORDERING_SUFFIX = {
+    "natural": "",
+    "random": "_r1",
+    "random2": "_r2",
+    "random3": "_r3",
+}
+
+@functools.lru_cache(maxsize=None)
 def get_graph_name(graph, ordering) -> str:
     ''' Returns the graph name based on the ordering. '''
-    if ordering == "natural":
-        return graph
-    elif ordering == "random":
-        return f"{graph}_r1"
-    elif ordering == "random2":
-        return f"{graph}_r2"
-    elif ordering == "random3":
-        return f"{graph}_r3"
-    else:
+    suffix = _ORDERING_SUFFIX.get(ordering)
+    if suffix is None:
         print(f"Invalid ordering: {ordering}")
         sys.exit(1)
+    return graph + suffix
 
+@functools.lru_cache(maxsize=4096)
 def get_abbr(value) -> str:
     ''' Returns a short abbreviation for a number. '''
     try:
@@ -49,56 +68,31 @@ def get_abbr(value) -> str:
     if num < 1000:
         # For small numbers, show as an integer if possible.
         return str(int(num)) if num.is_integer() else str(num)
-    elif True: #num < 1_000_000:
-        # For numbers between 1000 and 999,999, convert to thousands.
-        return f"{int(num // 1000)}k"
-    else:
-        # For numbers 1,000,000 and above, convert to millions.
-        m = num / 1_000_000
-        # If m is an exact integer, return without a decimal.
-        if m.is_integer():
-            return f"{int(m)}m"
-        else:
-            # Truncate to one decimal place.
-            truncated = math.floor(m * 10) / 10
-            # If the truncated value is an integer, don't show the decimal.
-            if truncated.is_integer():
-                return f"{int(truncated)}m"
-            else:
-                return f"{truncated:.1f}m"
-
-
-def get_algo_name(algo, conf) -> str:
-    ''' Returns the algorithm name based on the configuration. '''
-    if algo.starswith("heistream"):
-        stream_buffer = conf.strip()
-        return f"{algo}_{get_abbr(stream_buffer)}"
-    else:
-        parts = conf.split()
-        if len(parts) < 3:
-            return None
-        FPBS, SPBS, MQS = parts[:3]
-        return f"{algo}_1p{get_abbr(FPBS)}_2p{get_abbr(SPBS)}_mqs{get_abbr(MQS)}"
+    # Everything from 1000 on is shown in thousands, also millions (e.g. 1048576 -> 1048k).
+    return f"{int(num) // 1000}k"
+
 
 def get_algo_name_new(algo, conf, hyp_params, param_dict) -> str:
     ''' Returns the algorithm name based on the configuration and the defined. '''
+    return _build_algo_name(algo, conf, tuple(hyp_params.items()), tuple(param_dict.items()))
+
+@functools.lru_cache(maxsize=8192)
+def _build_algo_name(algo, conf, hyp_items, param_items) -> str:
+    ''' Cached worker of get_algo_name_new, hyp_params and param_dict are passed as item tuples. '''
     # Split the configuration string into individual parameter values
     param_values = conf.split()
 
-    # Take the order from the hyp_params keys (insertion order is preserved in Python 3.7+)
-    hyp_param_names = list(hyp_params.keys())
-
-    if len(param_values) < len(hyp_param_names):
+    # The order is taken from the hyp_params items (insertion order is preserved in Python 3.7+)
+    if len(param_values) < len(hyp_items):
         return None
 
     parts = []
-    for i, key in enumerate(hyp_param_names):
-        prefix = hyp_params[key]  # Use the mapping from hyp_params
-        value = param_values[i]
+    for (key, prefix), value in zip(hyp_items, param_values):
         parts.append(f"{prefix}{get_abbr(value)}")
 
     # Add the additional parameters from params
-    for param_name, param_value in param_dict.items():
+    hyp_param_names = {key for key, _ in hyp_items}
+    for param_name, param_value in param_items:
         if param_name in hyp_param_names:
             continue  # Skip if already included
 
@@ -109,26 +103,59 @@ def get_algo_name_new(algo, conf, hyp_params, param_dict) -> str:
 
     return f"{algo}_" + "_".join(parts)
 
+# Matches string literals (kept as group 1), // or /* */ comments and trailing commas
+# before } or ] (removed), so configs written for commentjson parse with orjson
+_COMMENT_RE = re.compile(rb'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/|,(?=(?:\s|//[^\n]*|/\*.*?\*/)*[}\]])', re.DOTALL)
+
 def read_config_file(config_file) -> dict:
     config_data = {}
     try:
-        with open(config_file, "r") as f:
-            config_data = commentjson.load(f)
+        with open(config_file, "rb") as f:
+            data = f.read()
+        try:
+            config_data = orjson.loads(_COMMENT_RE.sub(rb'\1', data))
+        except orjson.JSONDecodeError:
+            # Anything else commentjson accepts
+            config_data = commentjson.loads(data.decode("utf-8"))
     except Exception as e:
         fprint(f"Error reading config file: {e}")
         sys.exit(1)
     return config_data
 
+def write_json_atomic(output_file, data) -> None:
+    ''' Writes data as indented JSON to a temporary file and renames it, so output_file is never half written. '''
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+    os.replace(tmp_file, output_file)
+
+# Translation table for the display names of algorithms (underscores become dashes)
+_US2DASH = str.maketrans("_", "-")
+
+def get_enabled_orderings(orderings) -> dict:
+    ''' Returns a dict that maps each set name to the orderings enabled for it. '''
+    enabled_orderings = {}
+    for ord_name, ord_sets in orderings.items():
+        for set_name, set_enabled in ord_sets.items():
+            if set_enabled:
+                enabled_orderings.setdefault(set_name, []).append(ord_name)
+    return enabled_orderings
+
+def prefetch_graph_sets(orderings) -> None:
+    ''' Reads all graph sets enabled in the orderings up front, so a missing set file fails before the first run. '''
+    for set_name in get_enabled_orderings(orderings):
+        read_graph_set(set_name)
+
 def print_configuration_new(config_data, theme) -> None:
 
-    today = datetime.today().strftime('%Y-%m-%d')
+    today = get_today()
     # Append to this file
-    output_file = os.path.expanduser(f"~/outputs/{today}.json")
+    output_file = os.path.join(OUTPUTS_DIR, f"{today}.json")
 
     # if exists read it and append
     if os.path.exists(output_file):
-        with open(output_file, "r") as f:
-            output_config = json.load(f)
+        with open(output_file, "rb") as f:
+            output_config = orjson.loads(f.read())
     else:
         output_config = {
             "cfgs": []
@@ -140,15 +167,14 @@ def print_configuration_new(config_data, theme) -> None:
     configurations = config_data.get("configurations", [])
 
 
-    for set_name, _ in orderings["natural"].items():
+    enabled_orderings_by_set = get_enabled_orderings(orderings)
+
+    for set_name in orderings["natural"]:
 
         # Extract enabled orderings for the current set_name
-        enabled_orderings = []
-        for ord_name, ord_sets in orderings.items():
-            if set_name in ord_sets and ord_sets[set_name]:
-                enabled_orderings.append(ord_name)
+        enabled_orderings = enabled_orderings_by_set.get(set_name)
 
-        if len(enabled_orderings) == 0:
+        if not enabled_orderings:
             # If no orderings are enabled, skip this set_name
             continue
 
@@ -167,7 +193,7 @@ def print_configuration_new(config_data, theme) -> None:
             hyperparams = configuration.get("hyperparams", {})
             for i, conf in enumerate(configuration["to_run"]):
                 algo_conf = get_algo_name_new(algo, conf, hyperparams, param_dict)
-                output_config["cfgs"][-1]["algorithms"].append(f"{algo_conf} {algo_conf.replace('_', '-')}")
+                output_config["cfgs"][-1]["algorithms"].append(f"{algo_conf} {algo_conf.translate(_US2DASH)}")
 
     # for set_name, set_enabled in sets.items():
     #     if not set_enabled:
@@ -191,8 +217,7 @@ def print_configuration_new(config_data, theme) -> None:
 
 
     # Write the updated configuration to the output file
-    with open(output_file, "w") as f:
-        json.dump(output_config, f, indent=2)
+    write_json_atomic(output_file, output_config)
     print(f"Configuration written to {output_file}", flush=True)
 
     # Example of the output configuration file format:
@@ -220,35 +245,26 @@ def print_configuration_new(config_data, theme) -> None:
     #     ]
     # }
 
-def print_configuration_newest(config_data, theme) -> None:
-    """Generiert eine JSON-Konfigurationsdatei basierend auf den Eingabedaten."""
-    today = datetime.today().strftime('%Y-%m-%d')
-    # Ausgabedatei
-    output_file = os.path.expanduser(f"~/outputs/{today}.json")
-
-    # Falls die Datei existiert, einlesen und erweitern
-    if os.path.exists(output_file):
-        with open(output_file, "r") as f:
-            output_config = json.load(f)
-    else:
-        output_config = {
-            "cfgs": []
-        }
+def build_configuration_entries(config_data, theme) -> list:
+    """Erzeugt die "cfgs"-Einträge eines Themes, ohne etwas zu schreiben."""
+    output_config = {
+        "cfgs": []
+    }
 
     # Konfigurationsdaten auslesen
     orderings = config_data.get("orderings", {})
     configurations = config_data.get("configurations", [])
 
 
+    # Aktivierte Orderings je Set einmal vorab bestimmen
+    enabled_orderings_by_set = get_enabled_orderings(orderings)
+
     # Für jeden Set-Namen in den Orderings
-    for set_name, _ in orderings["natural"].items():
-        # Aktivierte Orderings extrahieren
-        enabled_orderings = []
-        for ord_name, ord_sets in orderings.items():
-            if set_name in ord_sets and ord_sets[set_name]:
-                enabled_orderings.append(ord_name)
-
-        if len(enabled_orderings) == 0:
+    for set_name in orderings["natural"]:
+        # Aktivierte Orderings nachschlagen
+        enabled_orderings = enabled_orderings_by_set.get(set_name)
+
+        if not enabled_orderings:
             # Wenn keine Orderings aktiviert sind, diesen Set überspringen
             continue
 
@@ -276,11 +292,69 @@ def print_configuration_newest(config_data, theme) -> None:
             for i, conf in enumerate(configuration["to_run"]):
                 algo_conf = get_algo_name_new(algo, conf, hyperparams, param_dict)
                 if algo_conf:  # Nur hinzufügen, wenn gültiger Name generiert wurde
-                    output_config["cfgs"][-1]["algorithms"].append(f"{max_cores} {algo_conf} {algo_conf.replace('_', '-')}")
+                    output_config["cfgs"][-1]["algorithms"].append(f"{max_cores} {algo_conf} {algo_conf.translate(_US2DASH)}")
+
+    return output_config["cfgs"]
+
+def print_configuration_newest(config_data, theme) -> None:
+    """Generiert eine JSON-Konfigurationsdatei basierend auf den Eingabedaten."""
+    today = get_today()
+    # Jedes Theme bekommt eine eigene Datei, zusammengeführt wird erst mit merge_configurations
+    output_dir = os.path.join(OUTPUTS_DIR, today)
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"{theme}.json")
+
+    output_config = {
+        "cfgs": build_configuration_entries(config_data, theme)
+    }
+
+    write_json_atomic(output_file, output_config)
+    print(f"Configuration written to {output_file}", flush=True)
+
+def print_configuration_batch(config_dir) -> None:
+    """Erzeugt ~/outputs/<date>.json für alle Config-Dateien in config_dir mit einem einzigen Schreibvorgang."""
+    output_file = os.path.join(OUTPUTS_DIR, f"{get_today()}.json")
+
+    config_files = sorted(glob.glob(os.path.join(config_dir, "*.json")))
+    if not config_files:
+        print(f"No config files found in {config_dir}")
+        sys.exit(1)
+
+    output_config = {
+        "cfgs": []
+    }
+    # Das Theme ist wie bei --config der Dateiname ohne Endung
+    for config_file in config_files:
+        theme = os.path.splitext(os.path.basename(config_file))[0]
+        output_config["cfgs"].extend(build_configuration_entries(read_config_file(config_file), theme))
+
+    os.makedirs(OUTPUTS_DIR, exist_ok=True)
+    write_json_atomic(output_file, output_config)
+    print(f"Configuration of {len(config_files)} config files written to {output_file}", flush=True)
+
+def merge_configurations() -> None:
+    """Fasst die Theme-Dateien aus ~/outputs/<date>/ zu ~/outputs/<date>.json zusammen."""
+    today = get_today()
+    output_dir = os.path.join(OUTPUTS_DIR, today)
+    output_file = os.path.join(OUTPUTS_DIR, f"{today}.json")
+
+    try:
+        shards = [entry for entry in os.scandir(output_dir) if entry.name.endswith(".json")]
+    except FileNotFoundError:
+        print(f"No configurations found in {output_dir}")
+        sys.exit(1)
+
+    # Reihenfolge der Erzeugung beibehalten
+    shards.sort(key=lambda entry: (entry.stat().st_mtime_ns, entry.name))
 
-    # Aktualisierte Konfiguration in die Ausgabedatei schreiben
-    with open(output_file, "w") as f:
-        json.dump(output_config, f, indent=2)
+    output_config = {
+        "cfgs": []
+    }
+    for entry in shards:
+        with open(entry.path, "rb") as f:
+            output_config["cfgs"].extend(orjson.loads(f.read())["cfgs"])
+
+    write_json_atomic(output_file, output_config)
     print(f"Configuration written to {output_file}", flush=True)
 
 
@@ -298,16 +372,9 @@ def print_configurations(algo, set_name, configurations, ordering, theme) -> Non
     (separated by whitespace), and the algorithm name is:
       <algo>_1p<abbr(FPBS)>_2p<abbr(SPBS)>_mqs<abbr(MQS)>
     """
-    OUTPUT_FILE = f"~/outputs/{theme}_{ordering}.json"
+    OUTPUT_FILE = os.path.join(OUTPUTS_DIR, f"{theme}_{ordering}.json")
     algorithms_list = []
 
-    colors = [
-        "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
-        "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf",
-        "#aec7e8", "#ffbb78", "#98df8a", "#ff9896", "#c5b0d5",
-        "#c49c94", "#f7b6d2", "#c7c7c7", "#dbdb8d", "#9edae5"
-    ]
-
     for configuration in configurations:
         param_dict = configuration.get("params", {})
         hyperparams = configuration.get("hyperparams", {})
@@ -318,8 +385,7 @@ def print_configurations(algo, set_name, configurations, ordering, theme) -> Non
             algorithms_list.append({
                 "name": algo_conf,
                 "data_path": data_path,
-                # "color": colors[i % len(colors)],
-                "legend_label": "\\textsc{" + algo_conf.replace('_', '-') + "}"
+                "legend_label": "\\textsc{" + algo_conf.translate(_US2DASH) + "}"
             })
 
     # Build the complete configuration using the provided template.
@@ -363,9 +429,8 @@ def print_configurations(algo, set_name, configurations, ordering, theme) -> Non
         }
     }
 
-    output_file = os.path.expanduser(OUTPUT_FILE)
-    with open(output_file, "w") as f:
-        json.dump(exp_config, f, indent=2)
+    output_file = OUTPUT_FILE
+    write_json_atomic(output_file, exp_config)
     print(f"Configuration written to {output_file}", flush=True)
 
 def get_fbs_output_dir(set_name, ordering, alg_name, max_cores) -> str:
@@ -373,14 +438,14 @@ def get_fbs_output_dir(set_name, ordering, alg_name, max_cores) -> str:
     Returns the output directory for FlatBuffers files for a given set name, ordering, and algorithm.
     The directory is constructed as: ~/results/fbs_<set_name>/<ordering>/<algo>
     """
-    return os.path.expanduser(os.path.join(f"{cfg.BASE_DIR_OUTPUT}/fbs_{set_name}/{ordering}", f"{max_cores}core{'' if max_cores == 1 else 's'}", alg_name))
+    return os.path.join(_BASE_DIR_OUTPUT, f"fbs_{set_name}", ordering, f"{max_cores}core{'' if max_cores == 1 else 's'}", alg_name)
 
 def get_processed_output_dir(set_name, ordering, max_cores) -> str:
     """
     Returns the processed output directory for a given set name, ordering, and algorithm.
     The directory is constructed as: ~/results/processed_results/<server>/<set_name>/<ordering>/<max_cores>/
     """
-    return os.path.expanduser(f"{cfg.BASE_DIR_PROCESSED_OUTPUT}/{set_name}/{ordering}/{max_cores}core{'' if max_cores == 1 else 's'}")
+    return os.path.join(_BASE_DIR_PROCESSED_OUTPUT, set_name, ordering, f"{max_cores}core{'' if max_cores == 1 else 's'}")
 
 
 
@@ -397,26 +462,25 @@ def produce_result(alg_name, graph, seed, k, runtime, memory, edge_cut, ECR):
         "memory": memory,
         "edge_cut": edge_cut,
         "solution_quality": ECR,
-        "success": "1" if str(edge_cut) != "0" else "0"
+        # edge_cut is an int (FBS files) or a str token (cuttana temp files), see the callers
+        "success": "0" if not edge_cut or edge_cut == "0" else "1"
     }
     return task
 
+# Failed results only differ in alg_name, graph and k
+_FAILED_RESULT = dict.fromkeys(fieldnames, "0")
+
 def produce_failed_result(alg_name, graph, k):
-    failed_task = {
-        "alg_name": alg_name,
-        "graph": graph,
-        "seed": "0",
-        "k": k,
-        "runtime": "0",
-        "memory": "0",
-        "edge_cut": "0",
-        "solution_quality": "0",
-        "success": "0"
-    }
+    failed_task = _FAILED_RESULT.copy()
+    failed_task["alg_name"] = alg_name
+    failed_task["graph"] = graph
+    failed_task["k"] = k
     return failed_task
 
 
 class Task:
+    __slots__ = ("raw_graph_name", "graph_path", "k", "stream_buffer", "max_pq_size", "old_target_path", "fbs_target_path")
+
     def __init__(self,  k, raw_graph_name, graph_path, stream_buffer, max_pq_size, old_target_path, fbs_target_path):
         self.raw_graph_name = raw_graph_name
         self.graph_path = graph_path